@@ -1,12 +1,21 @@
+import hashlib
 import io
 import json
+import os
 import zipfile
+from collections.abc import Iterable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 import fitz  # PyMuPDF
+import numpy as np
 import streamlit as st
-from PIL import Image, ImageChops, ImageDraw, ImageEnhance, ImageOps
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageOps
+
+from pdf_utils import PREVIEW_MAX_SIDE, image_to_png_bytes, render_pdf_page, render_pdf_preview
 
 st.set_page_config(page_title="Bio-TikZ Studio", page_icon="🧬", layout="wide")
 
@@ -17,6 +26,18 @@ OUTPUT_PROFILES = {
     "Grant/Investor Deck": {"dpi_scale": 3, "auto_crop": True, "line_thickness": "thick"},
 }
 
+# Optional per-panel cap in the composer: 4000 px is over 13 in at 300 DPI, wider than any journal page
+PANEL_MAX_SIDE = 4000
+PRECOMPRESSED_SUFFIXES = (".png", ".jpg", ".jpeg")
+
+# TikZ node options for each shape offered in the node generator
+CELL_SHAPE_STYLES = {
+    "circle": "circle",
+    "ellipse": "ellipse",
+    "rectangle": "rectangle",
+    "double circle": "circle, double, double distance=2pt",
+}
+
 TIKZ_TEMPLATES = {
     "Mitochondria (Bezier)": r"""\begin{tikzpicture}
 % Outer membrane
@@ -51,44 +72,133 @@ TIKZ_TEMPLATES = {
 }
 
 
-def convert_pdf_page_to_image(page: fitz.Page, dpi_scale: int, auto_crop: bool) -> Image.Image:
+def digest_bytes(data: bytes) -> bytes:
+    # Cache key for uploads: every byte is hashed, so same-sized files never share an entry
+    return hashlib.blake2b(data, digest_size=16, usedforsecurity=False).digest()
+
+
+@st.cache_resource(show_spinner=False)
+def render_pool() -> ProcessPoolExecutor:
+    # One long-lived pool shared by all sessions, so workers aren't re-forked for every upload
+    return ProcessPoolExecutor(max_workers=os.cpu_count())
+
+
+def reset_render_pool(pool: ProcessPoolExecutor) -> None:
+    # Shuts a broken pool down and uncaches it, unless another session already replaced it
+    pool.shutdown(wait=False, cancel_futures=True)
+    if render_pool() is pool:
+        render_pool.clear()
+
+
+def submit_render(render, *args) -> tuple[ProcessPoolExecutor, Future]:
+    # Returns the pool with the future, so a failure can be traced to the pool that ran it
+    pool = render_pool()
+    try:
+        return pool, pool.submit(render, *args)
+    except BrokenProcessPool:
+        reset_render_pool(pool)
+        pool = render_pool()
+        return pool, pool.submit(render, *args)
+
+
+def upload_digest(upload) -> bytes:
+    # Hashed once per upload: file_id is stable across reruns
+    digests = st.session_state.setdefault("upload_digests", {})
+    if upload.file_id not in digests:
+        digests[upload.file_id] = digest_bytes(upload.getvalue())
+    return digests[upload.file_id]
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def pdf_page_count(pdf_key: bytes, _pdf_bytes: bytes) -> int:
+    with fitz.open(stream=_pdf_bytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+# Renders are cached as futures, so a page already being rendered is awaited, not resubmitted
+@st.cache_resource(max_entries=64, show_spinner=False)
+def pdf_page_png_job(
+    pdf_key: bytes, _pdf_bytes: bytes, page_num: int, dpi_scale: int, auto_crop: bool
+) -> tuple[ProcessPoolExecutor, Future]:
+    return submit_render(render_pdf_page, pdf_key, _pdf_bytes, page_num, dpi_scale, auto_crop)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def pdf_page_preview_job(
+    pdf_key: bytes, _pdf_bytes: bytes, page_num: int, dpi_scale: int, auto_crop: bool
+) -> tuple[ProcessPoolExecutor, Future]:
+    return submit_render(render_pdf_preview, pdf_key, _pdf_bytes, page_num, dpi_scale, auto_crop)
+
+
+def render_result(job_cache, *args) -> bytes:
+    # Pages only ever render in the pool; one whose worker died is retried once on a fresh pool
+    for attempt in range(2):
+        pool, job = job_cache(*args)
+        try:
+            return job.result()
+        except BrokenProcessPool:
+            reset_render_pool(pool)
+            pdf_page_png_job.clear()
+            pdf_page_preview_job.clear()
+            if attempt:
+                raise
+        except Exception:
+            # Any other failure (a corrupt page, say) must not stay cached for every later rerun and session
+            job_cache.clear(*args)
+            raise
+
+
+def pdf_page_png(pdf_key: bytes, pdf_bytes: bytes, page_num: int, dpi_scale: int, auto_crop: bool) -> bytes:
+    # Deferred download callable: goes through the job cache, so repeat clicks reuse the render
+    args = (pdf_key, pdf_bytes, page_num, dpi_scale, auto_crop)
+    return render_result(pdf_page_png_job, *args)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def convert_pdf_bytes_to_pngs(pdf_key: bytes, _pdf_bytes: bytes, dpi_scale: int, auto_crop: bool) -> list[bytes]:
+    page_nums = range(pdf_page_count(pdf_key, _pdf_bytes))
+    render = partial(render_pdf_page, pdf_key, _pdf_bytes, dpi_scale=dpi_scale, auto_crop=auto_crop)
+
+    # Always through the pool, one contiguous page segment per worker
+    seg_size = max(1, -(-len(page_nums) // (os.cpu_count() or 1)))
+    for attempt in range(2):
+        pool = render_pool()
+        try:
+            return list(pool.map(render, page_nums, chunksize=seg_size))
+        except BrokenProcessPool:
+            reset_render_pool(pool)
+            if attempt:
+                raise
+
+
+@st.cache_data(max_entries=32, show_spinner=False, hash_funcs={bytes: digest_bytes})
+def load_upload_image(data: bytes, max_side: int | None = None) -> Image.Image:
+    # Keyed on the uploaded bytes, so unrelated widget changes don't decode the file again
     Image.MAX_IMAGE_PIXELS = None
-    mat = fitz.Matrix(dpi_scale, dpi_scale)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
-    img = Image.open(io.BytesIO(pix.tobytes("png"))).convert("RGB")
-
-    if auto_crop:
-        bg = Image.new(img.mode, img.size, img.getpixel((0, 0)))
-        diff = ImageChops.difference(img, bg)
-        bbox = diff.getbbox()
-        if bbox:
-            img = img.crop(bbox)
-
+    img = Image.open(io.BytesIO(data))
+    if max_side:
+        # JPEG only: libjpeg scales by 1/2, 1/4 or 1/8 during decode; a no-op for other formats
+        img.draft("RGB", (max_side, max_side))
+    # Decoders for 24-bit files already yield "RGB"; converting those would only copy every pixel
+    if img.mode == "RGB":
+        img.load()
+    else:
+        img = img.convert("RGB")
+    if max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
     return img
 
 
-def convert_pdf_bytes_to_images(pdf_bytes: bytes, dpi_scale: int, auto_crop: bool) -> list[Image.Image]:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    images = []
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        images.append(convert_pdf_page_to_image(page=page, dpi_scale=dpi_scale, auto_crop=auto_crop))
-    return images
-
-
-def image_to_png_bytes(img: Image.Image) -> bytes:
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return buf.getvalue()
-
-
-def build_zip(files: list[tuple[str, bytes]]) -> bytes:
+def build_zip(files: Iterable[tuple[str, bytes]]) -> bytes:
     zip_buffer = io.BytesIO()
     with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        # Entries are written as the iterable yields them; a generator never has to hold the whole set
         for filename, payload in files:
-            zf.writestr(filename, payload)
-    zip_buffer.seek(0)
-    return zip_buffer.read()
+            # PNG/JPEG payloads are already compressed; deflating them again only costs time
+            compress_type = zipfile.ZIP_STORED if filename.endswith(PRECOMPRESSED_SUFFIXES) else zipfile.ZIP_DEFLATED
+            zf.writestr(filename, payload, compress_type=compress_type)
+    # getvalue() hands over BytesIO's own buffer (trimmed in place); seek(0) + read() copied the archive
+    return zip_buffer.getvalue()
 
 
 def generate_cell_tikz(
@@ -106,13 +216,7 @@ def generate_cell_tikz(
     shadow_part = ", drop shadow" if show_shadow else ""
 
     # Logic for shape
-    shape_map = {
-        "circle": "circle",
-        "ellipse": "ellipse",
-        "rectangle": "rectangle",
-        "double circle": "circle, double, double distance=2pt",
-    }
-    final_shape = shape_map.get(cell_shape, "circle")
+    final_shape = CELL_SHAPE_STYLES.get(cell_shape, "circle")
 
     return f"""\\begin{{tikzpicture}}
 \\node [
@@ -165,13 +269,14 @@ def generate_legend_tikz(legend_items: list[dict[str, str]]) -> str:
         label = item["label"]
         shape = item["shape"]
         style = item.get("style", "solid") # This uses "solid" if "style" is missing
+        y_coord = f"{y:.2f}"  # Formatted once per row, shared by icon and label
         
         # Draw the shape icon with clean rounded coordinates
         lines.append(
-            f"\\node[{shape}, draw, {style}, fill={{[HTML]{{{color}}}!25}}, minimum size=0.45cm] at (0,{round(y, 2)}) {{}};"
+            f"\\node[{shape}, draw, {style}, fill={{[HTML]{{{color}}}!25}}, minimum size=0.45cm] at (0,{y_coord}) {{}};"
         )
         # Draw the text label
-        lines.append(f"\\node[anchor=west] at (0.6,{round(y, 2)}) {{{label}}};")
+        lines.append(f"\\node[anchor=west] at (0.6,{y_coord}) {{{label}}};")
         
         # Decrement y for the next row
         y -= 0.8
@@ -192,22 +297,61 @@ def build_full_tikz_document(tikz_body: str) -> str:
 
 
 def grayscale_score(img: Image.Image) -> float:
-    gray = ImageOps.grayscale(img)
-    hist = gray.histogram()
-    total = sum(hist)
+    # Already-grayscale images skip the luminance pass
+    if img.mode != "L":
+        img = ImageOps.grayscale(img)
+    gray = np.asarray(img, dtype=np.uint8).ravel()
+    total = gray.size
     if total == 0:
         return 0.0
-    low = sum(hist[:32]) / total
-    high = sum(hist[224:]) / total
-    mid = sum(hist[96:160]) / total
+    hist = np.bincount(gray, minlength=256)
+    low = int(hist[:32].sum()) / total
+    high = int(hist[224:].sum()) / total
+    mid = int(hist[96:160].sum()) / total
     score = (high + low) * 100 - mid * 15
     return max(0.0, min(100.0, round(score, 2)))
 
 
+@st.cache_data(max_entries=16, show_spinner=False, hash_funcs={bytes: digest_bytes})
+def upload_grayscale_score(data: bytes) -> float:
+    # Keyed on the compressed upload: hashing the decoded pixels cost about as much as the score
+    return grayscale_score(load_upload_image(data))
+
+
 def color_blind_preview(img: Image.Image) -> Image.Image:
-    r, g, b = img.split()
-    g_reduced = ImageEnhance.Brightness(g).enhance(0.35)
-    return Image.merge("RGB", (r, g_reduced, b))
+    arr = np.array(img, dtype=np.uint8)
+    # Dim the green channel to 35% in integer math (same truncation as a PIL brightness blend)
+    green = arr[..., 1].astype(np.uint16)
+    np.multiply(green, 35, out=green)
+    np.floor_divide(green, 100, out=green)
+    arr[..., 1] = green
+    return Image.fromarray(arr)
+
+
+@st.cache_data(max_entries=16, show_spinner=False, hash_funcs={bytes: digest_bytes})
+def upload_color_blind_preview(data: bytes, max_side: int | None = None) -> Image.Image:
+    # Keyed on the compressed upload rather than the decoded pixels, which are far larger to hash
+    return color_blind_preview(load_upload_image(data, max_side=max_side))
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def panel_label_glyph(label: str, color: str) -> tuple[np.ndarray, np.ndarray]:
+    # Cached blend-ready: inverse alpha and premultiplied colour plus rounding bias
+    _, _, right, bottom = ImageFont.load_default().getbbox(label)
+    glyph = Image.new("RGBA", (right, bottom), (0, 0, 0, 0))
+    ImageDraw.Draw(glyph).text((0, 0), label, fill=color)
+    glyph_arr = np.asarray(glyph).astype(np.uint32)
+    alpha = glyph_arr[..., 3:]
+    return 255 - alpha, glyph_arr[..., :3] * alpha + 128
+
+
+def blend_glyph(canvas_arr: np.ndarray, glyph: tuple[np.ndarray, np.ndarray], x: int, y: int) -> None:
+    # Alpha-blend a cached glyph into the canvas in place, with the same rounding as Image.paste
+    inv_alpha, premultiplied = glyph
+    region = canvas_arr[y : y + inv_alpha.shape[0], x : x + inv_alpha.shape[1]]
+    h, w = region.shape[:2]
+    blended = region * inv_alpha[:h, :w] + premultiplied[:h, :w]
+    region[...] = ((blended >> 8) + blended) >> 8
 
 
 def compose_panel(
@@ -222,20 +366,19 @@ def compose_panel(
     canvas_w = columns * cell_w + (columns + 1) * spacing
     canvas_h = rows * cell_h + (rows + 1) * spacing
 
-    canvas = Image.new("RGB", (canvas_w, canvas_h), bg_color)
-    draw = ImageDraw.Draw(canvas)
-
+    # Panels and labels all go into one contiguous buffer; PIL only wraps it at the end
+    canvas_arr = np.full((canvas_h, canvas_w, 3), ImageColor.getrgb(bg_color), dtype=np.uint8)
     for idx, img in enumerate(images):
         row = idx // columns
         col = idx % columns
         x = spacing + col * (cell_w + spacing)
         y = spacing + row * (cell_h + spacing)
-        canvas.paste(img, (x, y))
+        canvas_arr[y : y + img.height, x : x + img.width] = np.asarray(img)
         if add_labels:
-            label = chr(65 + idx)
-            draw.text((x + 10, y + 10), label, fill=label_color)
+            blend_glyph(canvas_arr, panel_label_glyph(chr(65 + idx), label_color), x + 10, y + 10)
 
-    return canvas
+    # Zero-copy wrap of the finished buffer (read-only; PIL copies it if anything later writes to it)
+    return Image.frombuffer("RGB", (canvas_w, canvas_h), canvas_arr, "raw", "RGB", 0, 1)
 
 
 def build_project_payload(state: dict) -> str:
@@ -250,6 +393,9 @@ st.title("🔬 Bio-TikZ Studio | End-to-End Figure Production")
 st.caption("Phase 1 + 2 + 3 features: conversion, design, accessibility, composition, packaging, and workflow automation")
 st.markdown("---")
 
+# Stamped once per session, so download names don't change on every rerun
+session_ts = st.session_state.setdefault("session_ts", datetime.now())
+
 main_tabs = st.tabs(
     [
         "🖼️ Converter Lab",
@@ -293,33 +439,61 @@ with main_tabs[0]:
     )
 
     if uploaded_pdfs:
-        zip_entries: list[tuple[str, bytes]] = []
         st.subheader(f"Processed Pages (@ {calculated_dpi} DPI)")
 
+        # Everything but the stem and page number is fixed for this run
+        page_filename = f"{{stem}}_{calculated_dpi}DPI_Page{{page}}.png".format
+        pending = []
+        batch_sources = []
         for pdf in uploaded_pdfs:
-            pdf_images = convert_pdf_bytes_to_images(pdf.read(), dpi_scale=dpi_scale, auto_crop=auto_crop)
+            pdf_key, pdf_bytes = upload_digest(pdf), pdf.getvalue()
             pdf_stem = Path(pdf.name).stem
-            st.markdown(f"**{pdf.name}**")
-
-            for page_idx, page_img in enumerate(pdf_images, start=1):
-                st.image(page_img, caption=f"{pdf_stem} | Page {page_idx}", use_container_width=True)
-                filename = f"{pdf_stem}_{calculated_dpi}DPI_Page{page_idx}.png"
-                png_bytes = image_to_png_bytes(page_img)
+            batch_sources.append((pdf_stem, pdf_key, pdf_bytes))
+            page_count = pdf_page_count(pdf_key, pdf_bytes)
+            st.markdown(f"**{pdf.name}** ({page_count} pages)")
+            # Only the page being looked at is rendered; the rest wait for the batch ZIP
+            page_idx = 1
+            if page_count > 1:
+                page_idx = st.number_input("Page", 1, page_count, 1, key=f"page_{pdf_stem}")
+
+            args = (pdf_key, pdf_bytes, page_idx - 1, dpi_scale, auto_crop)
+            pdf_page_preview_job(*args)  # queued now, collected below
+            pending.append((st.container(), pdf_stem, page_idx, args))
+
+        # Previews are already queued; each slot fills as soon as its own render finishes
+        for slot, pdf_stem, page_idx, args in pending:
+            filename = page_filename(stem=pdf_stem, page=page_idx)
+            with slot:
+                st.image(
+                    render_result(pdf_page_preview_job, *args),
+                    caption=f"{pdf_stem} | Page {page_idx}",
+                    use_container_width=True,
+                )
+                # Runs on click without a script context: plain captured values only, no st.session_state
                 st.download_button(
                     label=f"Download {filename}",
-                    data=png_bytes,
+                    data=partial(pdf_page_png, *args),
                     file_name=filename,
                     mime="image/png",
-                    key=f"single_{pdf_stem}_{page_idx}",
+                    key=f"single_{pdf_stem}",
                 )
-                zip_entries.append((filename, png_bytes))
 
-        if batch_mode and zip_entries:
-            zip_blob = build_zip(zip_entries)
+        def batch_pages():
+            # Yields every page of every PDF so build_zip never holds the whole batch in a list
+            for pdf_stem, pdf_key, pdf_bytes in batch_sources:
+                pngs = convert_pdf_bytes_to_pngs(pdf_key, pdf_bytes, dpi_scale=dpi_scale, auto_crop=auto_crop)
+                for page_idx, png_bytes in enumerate(pngs, start=1):
+                    yield page_filename(stem=pdf_stem, page=page_idx), png_bytes
+
+        def batch_zip():
+            # Runs on click without a script context: plain captured values only, no st.session_state
+            return build_zip(batch_pages())
+
+        if batch_mode:
             st.download_button(
                 "⬇️ Download Complete Batch (ZIP)",
-                data=zip_blob,
-                file_name=f"bio_tikz_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                data=batch_zip,
+                file_name=f"bio_tikz_batch_{session_ts.strftime('%Y%m%d_%H%M%S')}.zip",
                 mime="application/zip",
             )
 
@@ -333,16 +507,19 @@ with main_tabs[1]:
         st.subheader("Template Preview Code")
         st.code(TIKZ_TEMPLATES[template_choice], language="latex")
 
-    c1, c2, c3 = st.columns(3)
-    with c1:
-        cell_label = st.text_input("Cell Label", "Macrophage")
-        cell_color = st.color_picker("Cell Color", "#e74c3c")
-    with c2:
-        shape_option = st.selectbox("Shape", ["circle", "ellipse", "rectangle", "double circle"])
-        line_thickness = st.select_slider("Line Thickness", ["thin", "thick", "ultra thick"], value="thick")
-    with c3:
-        show_shadow = st.checkbox("Add Shadow", value=True)
-        preset = st.selectbox("Style Preset", ["Standard Cell", "Receptor", "Nucleus"])
+    # Batched in a form: typing a label no longer reruns the whole app per keystroke, only on Generate
+    with st.form("tikz_form"):
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            cell_label = st.text_input("Cell Label", "Macrophage")
+            cell_color = st.color_picker("Cell Color", "#e74c3c")
+        with c2:
+            shape_option = st.selectbox("Shape", ["circle", "ellipse", "rectangle", "double circle"])
+            line_thickness = st.select_slider("Line Thickness", ["thin", "thick", "ultra thick"], value="thick")
+        with c3:
+            show_shadow = st.checkbox("Add Shadow", value=True)
+            preset = st.selectbox("Style Preset", ["Standard Cell", "Receptor", "Nucleus"])
+        st.form_submit_button("Generate")
 
     tikz_code = generate_tikz_code(
         cell_label=cell_label,
@@ -353,11 +530,10 @@ with main_tabs[1]:
         preset=preset,
     )
     full_doc_mode = st.toggle("Generate full .tex document", value=False)
-    current_hex = cell_color.replace("#", "")
-    
-    clean_tikz = tikz_code.split("\n\n")[-1] if "% Add this" in tikz_code else tikz_code
 
     if full_doc_mode:
+        current_hex = cell_color.replace("#", "")
+        clean_tikz = tikz_code.split("\n\n")[-1] if "% Add this" in tikz_code else tikz_code
         final_output = f"""\\documentclass[tikz,border=10pt]{{standalone}}
 \\usetikzlibrary{{shapes.geometric, shadows}}
 \\usepackage{{xcolor}}
@@ -370,7 +546,8 @@ with main_tabs[1]:
 
 \\end{{document}}"""
     else:
-        final_output = f"% Add this to your preamble:\n\\definecolor{{mycolor}}{{HTML}}{{{current_hex}}}\n\n{clean_tikz}"
+        # generate_tikz_code already prefixes the preamble hint, so the snippet is used as-is
+        final_output = tikz_code
 
     st.subheader("Generated Node Code")
     st.code(final_output, language="latex")
@@ -388,21 +565,20 @@ with main_tabs[1]:
         if st.button("🧬 Load Immunometabolism Preset"):
             st.session_state.preset_labels = ["DAPI (Nucleus)", "CD8+ T-Cell", "Glucose Flux", "Mitochondria"]
             st.session_state.preset_colors = ["#0000FF", "#FF0000", "#00FF00", "#FFA500"]
-            st.rerun()
+            # The legend widgets below read the preset in this same run, so no st.rerun() is needed
     # --- PRESET LOGIC END ---
 
     n_items = st.slider("Number of legend items", 2, 8, 4)
     legend_items = []
+    # Preset labels/colors if one was loaded, otherwise generic entities in default blue
+    default_labels = st.session_state.get("preset_labels", [f"Entity {j+1}" for j in range(8)])
+    default_colors = st.session_state.get("preset_colors", ["#3498db"] * 8)
     for i in range(n_items):
         l1, l2, l3, l4 = st.columns(4)
         with l1:
-            # Check if a preset exists for this index, otherwise use default
-            default_label = st.session_state.get("preset_labels", [f"Entity {j+1}" for j in range(8)])[i]
-            label = st.text_input(f"Label {i+1}", default_label, key=f"lab_{i}")
+            label = st.text_input(f"Label {i+1}", default_labels[i], key=f"lab_{i}")
         with l2:
-            # Check if a preset color exists, otherwise use default blue
-            default_color = st.session_state.get("preset_colors", ["#3498db"] * 8)[i]
-            color = st.color_picker(f"Color {i+1}", default_color, key=f"col_{i}")
+            color = st.color_picker(f"Color {i+1}", default_colors[i], key=f"col_{i}")
         with l3:
             shape = st.selectbox(f"Shape {i+1}", ["circle", "rectangle", "ellipse"], key=f"shp_{i}")
         with l4:
@@ -457,27 +633,31 @@ with main_tabs[2]:
     uploaded_image = st.file_uploader("Upload PNG/JPG for accessibility check", type=["png", "jpg", "jpeg"])
 
     if uploaded_image is not None:
-        Image.MAX_IMAGE_PIXELS = None
-        base_img = Image.open(uploaded_image).convert("RGB")
-        gray_img = ImageOps.grayscale(base_img)
-        cb_img = color_blind_preview(base_img)
-
-        score = grayscale_score(base_img)
+        image_data = uploaded_image.getvalue()
+        score = upload_grayscale_score(image_data)
         st.metric("Grayscale Resilience Score", f"{score}/100")
 
+        # On-screen previews come from a reduced decode; the reviewer package keeps full resolution
+        preview_img = load_upload_image(image_data, max_side=PREVIEW_MAX_SIDE)
         c1, c2, c3 = st.columns(3)
         with c1:
-            st.image(base_img, caption="Original", use_container_width=True)
+            st.image(preview_img, caption="Original", use_container_width=True)
         with c2:
-            st.image(gray_img, caption="Grayscale Preview", use_container_width=True)
+            st.image(ImageOps.grayscale(preview_img), caption="Grayscale Preview", use_container_width=True)
         with c3:
-            st.image(cb_img, caption="Color-Blind Approximation", use_container_width=True)
+            st.image(
+                upload_color_blind_preview(image_data, PREVIEW_MAX_SIDE),
+                caption="Color-Blind Approximation",
+                use_container_width=True,
+            )
 
-        reviewer_files = [
-            ("figure_original.png", image_to_png_bytes(base_img)),
-            ("figure_grayscale.png", image_to_png_bytes(gray_img.convert("RGB"))),
-            ("figure_colorblind_preview.png", image_to_png_bytes(cb_img)),
-            (
+        def reviewer_files():
+            # Encoded one at a time as build_zip consumes them
+            base_img = load_upload_image(image_data)
+            yield "figure_original.png", image_to_png_bytes(base_img)
+            yield "figure_grayscale.png", image_to_png_bytes(ImageOps.grayscale(base_img).convert("RGB"))
+            yield "figure_colorblind_preview.png", image_to_png_bytes(upload_color_blind_preview(image_data))
+            yield (
                 "reviewer_notes.md",
                 (
                     "# Reviewer Export Notes\n"
@@ -485,9 +665,12 @@ with main_tabs[2]:
                     "- Included original, grayscale, and color-blind preview exports.\n"
                     "- Suggested check: verify labels remain legible at print scale.\n"
                 ).encode("utf-8"),
-            ),
-        ]
-        reviewer_zip = build_zip(reviewer_files)
+            )
+
+        def reviewer_zip():
+            # Runs on click without a script context: plain captured values only, no st.session_state
+            return build_zip(reviewer_files())
+
         st.download_button(
             "📚 Download Reviewer Package (ZIP)",
             data=reviewer_zip,
@@ -513,10 +696,13 @@ with main_tabs[3]:
             label_color = st.color_picker("Label Color", "#000000")
 
         add_labels = st.checkbox("Add panel labels (A, B, C...)", value=True)
-        Image.MAX_IMAGE_PIXELS = None
-        images = [Image.open(f).convert("RGB") for f in panel_files]
+        # Off by default: the composed figure is a deliverable and keeps every panel's full resolution
+        cap_panels = st.checkbox(
+            f"Downscale panels larger than {PANEL_MAX_SIDE} px (faster, lower resolution)", value=False
+        )
+        panel_max_side = PANEL_MAX_SIDE if cap_panels else None
         composed = compose_panel(
-            images=images,
+            images=[load_upload_image(f.getvalue(), max_side=panel_max_side) for f in panel_files],
             columns=columns,
             spacing=spacing,
             bg_color=bg_color,
@@ -524,10 +710,13 @@ with main_tabs[3]:
             label_color=label_color,
         )
 
-        st.image(composed, caption="Composed Panel Figure", use_container_width=True)
+        # Encoded once; st.image ships PNG bytes as-is
+        composed_png = image_to_png_bytes(composed)
+        del composed
+        st.image(composed_png, caption="Composed Panel Figure", use_container_width=True)
         st.download_button(
             "⬇️ Download Composed Panel",
-            data=image_to_png_bytes(composed),
+            data=composed_png,
             file_name="composed_panel.png",
             mime="image/png",
         )
@@ -538,7 +727,7 @@ with main_tabs[4]:
     st.subheader("Save/Load Workspace State")
     workspace_payload = {
         "profile": OUTPUT_PROFILES,
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": session_ts.isoformat(),
         "note": "Bio-TikZ Studio project state",
     }
 
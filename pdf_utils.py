@@ -0,0 +1,263 @@
+# Render-worker code; importable so the process pool can pickle it across Streamlit reruns
+
+import io
+import math
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, ImageChops
+
+try:
+    import pyvips  # Optional: a faster PNG encoder than Pillow's
+except (ImportError, OSError):
+    pyvips = None
+
+PREVIEW_MAX_SIDE = 1200
+FULL_AA_LEVEL = 8
+PREVIEW_AA_LEVEL = 2
+STRIP_RENDER_PIXELS = 16_000_000
+# Auto-crop first locates the content on a render at this scale, then rasterizes only that region
+CROP_PROBE_SCALE = 1.0
+CROP_PROBE_PAD = 2
+
+
+def content_bbox(img: Image.Image) -> tuple[int, int, int, int] | None:
+    width, height = img.size
+    bg = img.getpixel((0, 0))
+    # Top-right and bottom-left both off-background: content touches every edge
+    if img.getpixel((width - 1, 0)) != bg and img.getpixel((0, height - 1)) != bg:
+        return None
+    # Otherwise check the four edge lines. np.asarray on the whole page would copy every pixel
+    edges = ((0, 0, width, 1), (0, height - 1, width, height), (0, 0, 1, height), (width - 1, 0, width, height))
+    if all((np.asarray(img.crop(edge)) != bg).any() for edge in edges):
+        return None
+
+    # XOR with the background leaves non-zero pixels exactly where the content is
+    bands = bg if isinstance(bg, tuple) else (bg,)
+    lut = [v ^ c for c in bands for v in range(256)]
+    return img.point(lut).getbbox()
+
+
+@contextmanager
+def antialias_level(level: int):
+    # get_pixmap has no aa argument; MuPDF reads a process-wide level, so restore it afterwards
+    previous = fitz.TOOLS.show_aa_level()["graphics"]
+    fitz.TOOLS.set_aa_level(level)
+    try:
+        yield
+    finally:
+        fitz.TOOLS.set_aa_level(previous)
+
+
+def pixmap_to_image(pix: fitz.Pixmap) -> Image.Image:
+    # alpha=False gives plain L/RGB samples, read through the memoryview without a copy
+    mode = "L" if pix.n == 1 else "RGB"
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride)
+
+
+def render_in_strips(
+    page: fitz.Page | fitz.DisplayList,
+    mat: fitz.Matrix,
+    bounds: fitz.IRect,
+    box: tuple[int, int, int, int],
+) -> Image.Image:
+    # Renders box (left, top, right, bottom) in bands; peak memory is the output plus one strip
+    left, top, right, bottom = box
+    strip_rows = max(1, STRIP_RENDER_PIXELS // (right - left))
+    img = Image.new("RGB", (right - left, bottom - top))
+    for y0 in range(top, bottom, strip_rows):
+        y1 = min(bottom, y0 + strip_rows)
+        clip = fitz.Rect(bounds.x0 + left, bounds.y0 + y0, bounds.x0 + right, bounds.y0 + y1) / mat.a
+        pix = page.get_pixmap(matrix=mat, alpha=False, clip=clip)
+        # Place by the pixmap's own origin: rounding can widen a clip by a pixel on either side
+        img.paste(pixmap_to_image(pix), (pix.x - bounds.x0 - left, pix.y - bounds.y0 - top))
+        del pix
+    return img
+
+
+def probe_content_box(
+    page: fitz.Page | fitz.DisplayList, mat: fitz.Matrix, bounds: fitz.IRect
+) -> tuple[int, int, int, int] | None:
+    # Padded full-resolution box around the content found on a low-resolution probe render
+    probe = page.get_pixmap(matrix=fitz.Matrix(CROP_PROBE_SCALE, CROP_PROBE_SCALE), alpha=False)
+    bbox = content_bbox(pixmap_to_image(probe))
+    if bbox is None:
+        return None
+
+    ratio = mat.a / CROP_PROBE_SCALE
+    left, top, right, bottom = bbox
+    return (
+        max(0, math.floor((probe.x + left) * ratio) - bounds.x0 - CROP_PROBE_PAD),
+        max(0, math.floor((probe.y + top) * ratio) - bounds.y0 - CROP_PROBE_PAD),
+        min(bounds.width, math.ceil((probe.x + right) * ratio) - bounds.x0 + CROP_PROBE_PAD),
+        min(bounds.height, math.ceil((probe.y + bottom) * ratio) - bounds.y0 + CROP_PROBE_PAD),
+    )
+
+
+def convert_pdf_page_to_image(
+    page: fitz.Page | fitz.DisplayList,
+    dpi_scale: int,
+    auto_crop: bool,
+    aa: int = FULL_AA_LEVEL,
+) -> Image.Image:
+    Image.MAX_IMAGE_PIXELS = None
+    mat = fitz.Matrix(dpi_scale, dpi_scale)
+    bounds = (page.rect * mat).irect
+    box = None
+    with antialias_level(aa):
+        # Only worth a probe render when it costs a small fraction (1/16 or less) of the real one
+        if auto_crop and dpi_scale >= 4 * CROP_PROBE_SCALE:
+            box = probe_content_box(page=page, mat=mat, bounds=bounds)
+
+        if box is not None or bounds.width * bounds.height > STRIP_RENDER_PIXELS:
+            box = box or (0, 0, bounds.width, bounds.height)
+            img = render_in_strips(page=page, mat=mat, bounds=bounds, box=box)
+        else:
+            pix = page.get_pixmap(matrix=mat, alpha=False)
+            img = pixmap_to_image(pix)
+            # PIL holds its own copy now; release MuPDF's pixel buffer before cropping
+            del pix
+
+    if auto_crop:
+        bbox = content_bbox(img)
+        if bbox:
+            img = img.crop(bbox)
+
+    return img
+
+
+def has_color(rgb: np.ndarray) -> bool:
+    return bool((rgb[..., 0] != rgb[..., 1]).any() or (rgb[..., 1] != rgb[..., 2]).any())
+
+
+def gray_channel(img: Image.Image) -> Image.Image | None:
+    # The single channel of an RGB image whose pixels all have R == G == B, else None
+    if img.mode != "RGB":
+        return None
+    if has_color(np.asarray(img.resize((max(1, img.width // 32), max(1, img.height // 32)), Image.NEAREST))):
+        return None
+    red, green, blue = img.split()
+    if ImageChops.difference(red, green).getbbox() or ImageChops.difference(red, blue).getbbox():
+        return None
+    return red
+
+
+def convert_pdf_page_to_png(page: fitz.Page | fitz.DisplayList, dpi_scale: int, auto_crop: bool) -> bytes:
+    # Neutral-only pages are written as single-channel PNGs
+    mat = fitz.Matrix(dpi_scale, dpi_scale)
+    bounds = (page.rect * mat).irect
+    # Cropped and strip-rendered pages both go through the one PIL rasterization path
+    if auto_crop or bounds.width * bounds.height > STRIP_RENDER_PIXELS:
+        img = convert_pdf_page_to_image(page=page, dpi_scale=dpi_scale, auto_crop=auto_crop)
+        gray = gray_channel(img)
+        return image_to_png_bytes(img if gray is None else gray)
+
+    with antialias_level(FULL_AA_LEVEL):
+        pix = page.get_pixmap(matrix=mat, alpha=False)
+    # Sampled in place from MuPDF's samples, so colour pages are never copied into PIL
+    rows = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+    if not has_color(rows[::32, : pix.width * 3].reshape(-1, pix.width, 3)[:, ::32]):
+        gray = gray_channel(pixmap_to_image(pix))
+        if gray is not None:
+            return image_to_png_bytes(gray)
+
+    # Colour and nothing to crop: let MuPDF write the PNG straight from its own samples
+    png_bytes = pix.tobytes("png")
+    pix = None
+    return png_bytes
+
+
+_open_pdfs: dict[bytes, fitz.Document] = {}
+_page_lists: dict[tuple[bytes, int], fitz.DisplayList] = {}
+
+
+def open_pdf(pdf_key: bytes, pdf_bytes: bytes) -> fitz.Document:
+    # Pool workers only (single-threaded): each keeps the last PDF it parsed open for its next page
+    doc = _open_pdfs.get(pdf_key)
+    if doc is None:
+        _page_lists.clear()
+        for stale in _open_pdfs.values():
+            stale.close()
+        _open_pdfs.clear()
+        doc = _open_pdfs[pdf_key] = fitz.open(stream=pdf_bytes, filetype="pdf")
+    return doc
+
+
+def page_display_list(pdf_key: bytes, page: fitz.Page) -> fitz.DisplayList:
+    # Parsed once per page and replayed by every render of it on this worker; last page only
+    key = (pdf_key, page.number)
+    if key not in _page_lists:
+        _page_lists.clear()
+        _page_lists[key] = page.get_displaylist()
+    return _page_lists[key]
+
+
+def embedded_page_image(page: fitz.Page, dpi_scale: int) -> Image.Image | None:
+    # An unrotated page that is one upright full-page bitmap is decoded, not rasterized, at the requested DPI
+    if page.rotation or len(page.get_images()) != 1:
+        return None
+    infos = page.get_image_info(xrefs=True)
+    if len(infos) != 1 or infos[0]["has-mask"]:
+        return None
+    info = infos[0]
+    a, b, c, d, _, _ = info["transform"]
+    if b or c or a <= 0 or d <= 0 or not fitz.Rect(info["bbox"]).contains(page.rect):
+        return None
+    mat = fitz.Matrix(dpi_scale, dpi_scale)
+    bounds = (page.rect * mat).irect
+    if info["width"] < bounds.width or info["height"] < bounds.height:
+        return None
+    if page.get_text().strip() or page.get_drawings():
+        return None
+
+    # L and RGB bitmaps only; CMYK, Lab and alpha go through the renderer
+    try:
+        pix = fitz.Pixmap(page.parent, info["xref"])
+    except (RuntimeError, ValueError):
+        return None
+    if pix.alpha or pix.n not in (1, 3) or "Lab" in pix.colorspace.name:
+        return None
+    img = pixmap_to_image(pix)
+    del pix
+    target = (fitz.Rect(info["bbox"]) * mat).irect
+    if img.width > target.width or img.height > target.height:
+        img = img.resize((target.width, target.height), Image.Resampling.LANCZOS)
+    return img
+
+
+def render_pdf_page(pdf_key: bytes, pdf_bytes: bytes, page_num: int, dpi_scale: int, auto_crop: bool) -> bytes:
+    page = open_pdf(pdf_key, pdf_bytes).load_page(page_num)
+    img = embedded_page_image(page=page, dpi_scale=dpi_scale)
+    if img is None:
+        return convert_pdf_page_to_png(page=page_display_list(pdf_key, page), dpi_scale=dpi_scale, auto_crop=auto_crop)
+
+    if auto_crop:
+        bbox = content_bbox(img)
+        if bbox:
+            img = img.crop(bbox)
+    # extract_image hands some gray bitmaps back as RGB; write those single-channel too
+    gray = gray_channel(img)
+    return image_to_png_bytes(img if gray is None else gray)
+
+
+def render_pdf_preview(pdf_key: bytes, pdf_bytes: bytes, page_num: int, dpi_scale: int, auto_crop: bool) -> bytes:
+    page = page_display_list(pdf_key, open_pdf(pdf_key, pdf_bytes).load_page(page_num))
+    # Rasterized at display size rather than downscaled from a full-DPI render
+    preview_scale = min(dpi_scale, PREVIEW_MAX_SIDE / max(page.rect.width, page.rect.height))
+    preview = convert_pdf_page_to_image(
+        page=page, dpi_scale=preview_scale, auto_crop=auto_crop, aa=PREVIEW_AA_LEVEL
+    )
+    # Encoded here, once, so cached previews reach st.image as bytes and are not re-encoded every rerun
+    return image_to_png_bytes(preview)
+
+
+def image_to_png_bytes(img: Image.Image, compress_level: int = 1) -> bytes:
+    # Fast deflate by default: a higher level costs several times the CPU for a marginally smaller file
+    if pyvips is not None and img.mode in ("L", "RGB"):
+        # libvips writes unfiltered rows, about 3x faster than Pillow at the same level for a larger file
+        vimg = pyvips.Image.new_from_memory(img.tobytes(), img.width, img.height, len(img.getbands()), "uchar")
+        return vimg.pngsave_buffer(compression=compress_level)
+    with io.BytesIO() as buf:
+        img.save(buf, format="PNG", compress_level=compress_level)
+        return buf.getvalue()